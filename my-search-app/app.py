@@ -2,7 +2,46 @@
 import streamlit as st
 import tempfile
 import os
-from db import init_db, ingest_csv_in_chunks, ingest_txt_in_chunks, search_records
+from db import (
+    init_db,
+    clear_records,
+    ingest_csv_in_chunks,
+    ingest_txt_in_chunks,
+    search_records,
+    count_records,
+)
+
+DB_PATH = "records.db"
+
+def _db_mtime():
+    """
+    Latest modification time across the DB file and its WAL. Under WAL
+    mode an ingest may only touch the -wal file, so checking records.db
+    alone would miss invalidations.
+    """
+    mtime = 0.0
+    for path in (DB_PATH, DB_PATH + "-wal"):
+        if os.path.exists(path):
+            mtime = max(mtime, os.path.getmtime(path))
+    return mtime
+
+@st.cache_resource
+def get_engine():
+    """
+    One engine (and its pooled connections) per process. Without this,
+    every Streamlit rerun built a fresh engine and every query opened a
+    brand-new SQLite connection, re-running the connect-time pragmas.
+    """
+    return init_db()
+
+@st.cache_data(max_entries=256)
+def _cached_search(query_str, db_mtime, limit):
+    """
+    Memoized search: repeated queries (and Streamlit re-renders) hit an
+    in-process cache instead of re-running the SQL. db_mtime is part of
+    the key purely so an ingest invalidates stale entries.
+    """
+    return search_records(get_engine(), query_str, limit=limit)
 
 def main():
     st.title("Large File Search App")
@@ -13,16 +52,15 @@ def main():
         and you can repeatedly search for partial text matches.
     """)
 
-    # 1) Initialize or connect to the DB
-    engine = init_db()
+    # 1) Initialize or connect to the DB (cached across reruns)
+    engine = get_engine()
 
     # 2) File Uploader (CSV or TXT)
     uploaded_file = st.file_uploader("Upload your CSV or TXT file", type=["csv", "txt"])
     if uploaded_file is not None:
         # Optional: Clear existing records if user wants a fresh start
         if st.checkbox("Clear existing data before ingest? (Warning: This removes old data)", value=False):
-            with engine.connect() as conn:
-                conn.execute("DELETE FROM records")
+            clear_records(engine)
 
         # Write uploaded file to a temporary location
         with tempfile.NamedTemporaryFile(delete=False) as tmp:
@@ -58,16 +96,26 @@ def main():
 
     # 3) Multi-token partial substring search
     query_str = st.text_input("Enter partial text (e.g., 'cas ford lie'):")
+    show_count = st.checkbox("Count all matches (runs a second, slower query)", value=False)
     if st.button("Search"):
         if query_str.strip():
-            results = search_records(engine, query_str.strip())
-            st.write(f"Found {len(results)} result(s).")
-
-            # If many results, show the first 200 for performance reasons
+            # Only show the first 200; ask for one extra row so we can
+            # tell whether the results were truncated.
             max_to_show = 200
+            results = _cached_search(query_str.strip(), _db_mtime(), max_to_show + 1)
+            truncated = len(results) > max_to_show
+
+            if truncated and show_count:
+                total = count_records(engine, query_str.strip())
+                st.write(f"Found {total} result(s).")
+            elif truncated:
+                st.write(f"Found more than {max_to_show} result(s).")
+            else:
+                st.write(f"Found {len(results)} result(s).")
+
             for row in results[:max_to_show]:
                 st.write(row)
-            if len(results) > max_to_show:
+            if truncated:
                 st.write("... (Showing the first 200 results only)")
         else:
             st.warning("Please enter a valid search term.")
@@ -1,104 +1,646 @@
 # db.py
+import bisect
+import mmap
+import os
+import pickle
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
 import pandas as pd
-from sqlalchemy import create_engine, text
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool
+
+try:
+    import ahocorasick
+except ImportError:  # optional: accelerates queries with only 1-2 char tokens
+    ahocorasick = None
+
+# Above this many rows the in-memory trigram index stops paying for
+# itself (build time + RAM); larger tables rely on the FTS5 index alone.
+_TRIGRAM_INDEX_MAX_ROWS = 1_000_000
+
+# Loaded sidecar, kept per-process so repeated searches don't unpickle
+_trigram_cache = {"path": None, "mtime": None, "postings": None}
+
+_CREATE_RECORDS = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS records
+    USING fts5(line, tokenize='trigram')
+"""
 
 def init_db(db_uri="sqlite:///records.db"):
     """
     Create (or connect to) a SQLite database and ensure
-    a 'records' table exists with 'id' and 'line' columns.
+    a 'records' FTS5 table exists with a 'line' column.
+    The trigram tokenizer indexes every 3-character substring,
+    so partial-substring searches can use the index instead of
+    scanning the whole table.
     """
-    engine = create_engine(db_uri)
+    # File-based SQLite defaults to NullPool, so every connect() (each
+    # search, each ingest chunk loop) opens a fresh OS connection and
+    # re-runs the pragma listener below. Pool and reuse them instead;
+    # check_same_thread is safe to drop since connections aren't shared
+    # concurrently across threads by the pool.
+    engine = create_engine(
+        db_uri,
+        poolclass=QueuePool,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, connection_record):
+        # SQLite's defaults (synchronous=FULL, rollback journal, ~2 MB
+        # cache, no mmap) make ingest fsync-bound and search read-bound.
+        cur = dbapi_conn.cursor()
+        # page_size only takes effect for a database this connection
+        # creates, so it must run before the first CREATE TABLE
+        cur.execute("PRAGMA page_size=8192")
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA mmap_size=30000000000")   # cap, not allocation
+        cur.execute("PRAGMA cache_size=-262144")      # 256 MiB page cache
+        cur.close()
+
     with engine.connect() as conn:
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                line TEXT
-            )
-        """))
+        conn.execute(text(_CREATE_RECORDS))
+        conn.commit()
     return engine
 
-def ingest_csv_in_chunks(engine, csv_path, chunksize=50000):
+def clear_records(engine):
+    """
+    Remove all records by dropping and recreating the table. DELETE FROM
+    would journal every row and leave free pages behind; DROP + CREATE
+    is O(1) regardless of table size and hands the pages straight back.
+    The trigram sidecar is deleted along with it.
+    """
+    with engine.connect() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS records"))
+        conn.execute(text(_CREATE_RECORDS))
+        conn.commit()
+    path = _index_path(engine)
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def ingest_csv_in_chunks(engine, csv_path, chunksize=262144):
     """
     Ingest a large CSV file into the 'records' table in chunks.
     Each row is stored as a single line (TEXT).
     """
+    # Fastest load path: the sqlite3 shell's .import feeds the C-level
+    # CSV reader straight into the table, with no pandas parse and no
+    # per-row Python binding at all. Fall back to the chunked pandas
+    # path when the CLI isn't installed or the DB isn't file-based.
+    database = engine.url.database
+    if database and database != ":memory:" and shutil.which("sqlite3"):
+        subprocess.run(
+            ["sqlite3", database, ".mode csv",
+             f'.import "{csv_path}" records'],
+            check=True,
+        )
+        _rebuild_trigram_index(engine)
+        # pandas only reads the 50 preview lines, not the whole file
+        return pd.read_csv(csv_path, header=None, names=["line"],
+                           dtype=str, na_filter=False, nrows=50)
+
     # We'll store the first chunk's data in memory to display a small preview
     first_chunk_data = None
 
-    # Stream the CSV in chunks
+    # Stream the CSV in chunks. The pyarrow engine can't stream chunks,
+    # so use the C parser with a large chunk size: 256k rows amortizes
+    # the per-chunk setup cost without holding the file in memory.
     reader = pd.read_csv(
         csv_path,
         header=None,        # treat the CSV as no headers
         dtype=str,          # store everything as string
         na_filter=False,    # don't parse NaNs
+        engine="c",         # C parser; the python engine is far slower
+        low_memory=False,   # parse each chunk in one pass
         chunksize=chunksize
     )
 
-    for i, chunk in enumerate(reader):
-        chunk.columns = ["line"]  # single column called 'line'
-        if i == 0:
-            first_chunk_data = chunk.head(50)  # keep up to 50 lines for preview
-        # Append chunk to DB
-        chunk.to_sql("records", engine, if_exists="append", index=False)
+    # pandas to_sql can't target a virtual table, so insert through the
+    # raw DBAPI connection with executemany instead. Everything goes in
+    # one transaction: committing per chunk would fsync once per 50k rows.
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN")
+        for i, chunk in enumerate(reader):
+            chunk.columns = ["line"]  # single column called 'line'
+            if i == 0:
+                first_chunk_data = chunk.head(50)  # keep up to 50 lines for preview
+            cur.executemany(
+                "INSERT INTO records(line) VALUES (?)",
+                [(line,) for line in chunk["line"].to_numpy().tolist()]
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    _rebuild_trigram_index(engine)
     return first_chunk_data
 
+# TXT ingest reads the memory map in slabs this large; each slab is cut
+# back to the last complete line before splitting.
+_TXT_SLAB_BYTES = 16 << 20
+
+# Files at least this big are split across worker processes
+_PARALLEL_TXT_MIN_BYTES = 256 << 20
+
+def _iter_txt_slabs(mm, pos, end):
+    """
+    Yield slabs of mm[pos:end] split at line boundaries, with any
+    trailing newline removed so split(b'\\n') never produces a phantom
+    empty line. A line longer than a slab is yielded whole.
+    """
+    while pos < end:
+        slab_end = min(pos + _TXT_SLAB_BYTES, end)
+        if slab_end < end:
+            # cut the slab at the last complete line
+            newline = mm.rfind(b"\n", pos, slab_end)
+            if newline == -1:
+                # a line longer than the slab: extend to its terminator
+                newline = mm.find(b"\n", slab_end, end)
+                slab_end = end if newline == -1 else newline + 1
+            else:
+                slab_end = newline + 1
+        slab = mm[pos:slab_end]
+        pos = slab_end
+        if slab.endswith(b"\n"):
+            slab = slab[:-1]
+        yield slab
+
+def _ingest_txt_shard(txt_path, start, end, shard_path, chunksize):
+    """
+    Worker: ingest the lines of txt_path whose first byte lies in
+    [start, end) into a standalone shard database. A line straddling
+    'end' is read to completion here and skipped by the next worker.
+    """
+    conn = sqlite3.connect(shard_path)
+    try:
+        cur = conn.cursor()
+        # shards are scratch files merged then deleted; no durability needed
+        cur.execute("PRAGMA journal_mode=OFF")
+        cur.execute("PRAGMA synchronous=OFF")
+        cur.execute("CREATE TABLE records(line TEXT)")
+        with open(txt_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                size = mm.size()
+                pos = start
+                if start > 0:
+                    # own only lines that begin at or after 'start':
+                    # skip past the newline terminating the previous line
+                    newline = mm.find(b"\n", start - 1)
+                    pos = size if newline == -1 else newline + 1
+                # extend 'end' so the straddling line is read whole
+                if end >= size:
+                    real_end = size
+                else:
+                    newline = mm.find(b"\n", end - 1)
+                    real_end = size if newline == -1 else newline + 1
+
+                # pre-sized buffer: fill by index instead of append/clear
+                # so the hot loop never reallocates list storage
+                buffer = [None] * chunksize
+                idx = 0
+                for slab in _iter_txt_slabs(mm, pos, real_end):
+                    for raw in slab.split(b"\n"):
+                        raw = raw.rstrip(b"\r")
+                        if not raw:
+                            continue  # blank lines just waste table space
+                        buffer[idx] = (raw.decode("utf-8", "ignore"),)
+                        idx += 1
+                        if idx == chunksize:
+                            cur.executemany(
+                                "INSERT INTO records(line) VALUES (?)", buffer
+                            )
+                            idx = 0
+                if idx:
+                    cur.executemany(
+                        "INSERT INTO records(line) VALUES (?)", buffer[:idx]
+                    )
+            finally:
+                mm.close()
+        conn.commit()
+    finally:
+        conn.close()
+
+def _ingest_txt_parallel(engine, txt_path, size, chunksize):
+    """
+    Map-reduce ingest: byte-range shards are parsed and inserted by
+    worker processes in parallel (decoding and binding are CPU-bound),
+    then merged into the main table with ATTACH + INSERT...SELECT, so
+    writes to the real DB only serialize at merge time.
+    """
+    workers = min(os.cpu_count() or 1, 8)
+    bounds = [size * i // workers for i in range(workers + 1)]
+    shard_dir = tempfile.mkdtemp(prefix="records_shards_")
+    try:
+        shard_paths = [
+            os.path.join(shard_dir, f"shard_{i}.db") for i in range(workers)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_ingest_txt_shard, txt_path,
+                            bounds[i], bounds[i + 1], shard_paths[i], chunksize)
+                for i in range(workers)
+            ]
+            for future in futures:
+                future.result()
+
+        conn = engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            for shard_path in shard_paths:
+                # ATTACH/DETACH can't run inside a transaction, so each
+                # shard merges as its own commit
+                cur.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+                cur.execute(
+                    "INSERT INTO records(line) SELECT line FROM shard.records"
+                )
+                conn.commit()
+                cur.execute("DETACH DATABASE shard")
+        finally:
+            conn.close()
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
 def ingest_txt_in_chunks(engine, txt_path, chunksize=50000):
     """
     Ingest a large text file into the 'records' table in chunks of lines.
+
+    The file is memory-mapped and consumed in 16 MiB slabs split on
+    newlines, so reading is one big memcpy per slab instead of a
+    readline call (and its buffer bookkeeping) per line. Decoded lines
+    are streamed straight into executemany as 1-tuples. Files of 256 MiB
+    or more are split by byte range across worker processes and merged
+    at the end (see _ingest_txt_parallel).
     """
-    first_chunk_data = []
-    buffer = []
-    count = 0
-    chunk_index = 0
-
-    with open(txt_path, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            buffer.append(line.strip("\n\r"))
-            count += 1
-
-            # If we've reached the chunksize, store this chunk in the DB
-            if count % chunksize == 0:
-                chunk_df = pd.DataFrame({"line": buffer})
-                # Save chunk to DB
-                chunk_df.to_sql("records", engine, if_exists="append", index=False)
-                # Save chunk #0 for preview
-                if chunk_index == 0:
-                    first_chunk_data = chunk_df.head(50)
-                buffer = []
-                chunk_index += 1
-
-    # If there are leftover lines in the buffer after the loop ends
-    if buffer:
-        chunk_df = pd.DataFrame({"line": buffer})
-        chunk_df.to_sql("records", engine, if_exists="append", index=False)
-        if chunk_index == 0:  # means everything fit into one chunk
-            first_chunk_data = chunk_df.head(50)
+    preview_lines = []  # first 50 lines only, for the UI preview
 
-    return first_chunk_data
+    size = os.path.getsize(txt_path)
+    if size >= _PARALLEL_TXT_MIN_BYTES and (os.cpu_count() or 1) > 1:
+        with open(txt_path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if not line:
+                    continue  # ingest skips blank lines; mirror that here
+                preview_lines.append(line)
+                if len(preview_lines) == 50:
+                    break
+        _ingest_txt_parallel(engine, txt_path, size, chunksize)
+        _rebuild_trigram_index(engine)
+        return pd.DataFrame({"line": preview_lines})
+
+    # pre-sized buffer: fill by index instead of append/clear so the hot
+    # loop never reallocates list storage
+    buffer = [None] * chunksize
+    idx = 0
+
+    # Single transaction for the whole file (see ingest_csv_in_chunks)
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN")
+        with open(txt_path, "rb") as f:
+            if size:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    for slab in _iter_txt_slabs(mm, 0, size):
+                        for raw in slab.split(b"\n"):
+                            raw = raw.rstrip(b"\r")
+                            if not raw:
+                                continue  # blank lines just waste table space
+                            buffer[idx] = (raw.decode("utf-8", "ignore"),)
+                            idx += 1
+                            if idx == chunksize:
+                                if not preview_lines:
+                                    preview_lines = [t[0] for t in buffer[:50]]
+                                cur.executemany(
+                                    "INSERT INTO records(line) VALUES (?)",
+                                    buffer
+                                )
+                                idx = 0
+                finally:
+                    mm.close()
+
+        # If there are leftover lines in the buffer after the loop ends
+        if idx:
+            if not preview_lines:
+                preview_lines = [t[0] for t in buffer[:idx][:50]]
+            cur.executemany(
+                "INSERT INTO records(line) VALUES (?)", buffer[:idx]
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    _rebuild_trigram_index(engine)
+
+    # Build the preview DataFrame once, at the end
+    return pd.DataFrame({"line": preview_lines})
+
+def _index_path(engine):
+    """Sidecar path for the trigram index, or None for in-memory DBs."""
+    database = engine.url.database
+    if not database or database == ":memory:":
+        return None
+    return database + ".trgm"
+
+def _line_trigrams(s):
+    """Set of lowercased 3-character substrings of s."""
+    s = s.lower()
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def _rebuild_trigram_index(engine):
+    """
+    Rebuild the in-process inverted trigram index after an ingest.
+
+    For tables that fit in RAM, intersecting Python posting sets beats
+    round-tripping every query through SQL. The index maps each trigram
+    to the set of rowids containing it and is pickled next to the DB
+    file. Ingest (and clearing) own the sidecar's lifecycle: tables
+    above the row cap get the sidecar deleted instead.
+    """
+    path = _index_path(engine)
+    if path is None:
+        return
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        n_rows = cur.execute("SELECT count(*) FROM records").fetchone()[0]
+        if n_rows > _TRIGRAM_INDEX_MAX_ROWS:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        postings = {}
+        for rowid, line in cur.execute("SELECT rowid, line FROM records"):
+            for tri in _line_trigrams(line):
+                postings.setdefault(tri, set()).add(rowid)
+        with open(path, "wb") as f:
+            pickle.dump(postings, f, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        conn.close()
+
+def _load_trigram_index(engine):
+    """Return the pickled trigram postings, or None if there is no sidecar."""
+    path = _index_path(engine)
+    if path is None or not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    if _trigram_cache["path"] != path or _trigram_cache["mtime"] != mtime:
+        with open(path, "rb") as f:
+            postings = pickle.load(f)
+        _trigram_cache.update(path=path, mtime=mtime, postings=postings)
+    return _trigram_cache["postings"]
+
+def _search_with_index(engine, postings, tokens, limit):
+    """
+    Intersect trigram posting sets (smallest first) to get candidate
+    rowids, then fetch those rows and verify every token as a real
+    substring — trigram containment alone can over-match.
+    """
+    posting_sets = []
+    for token in tokens:
+        if len(token) < 3:
+            continue  # no trigrams to look up; verified after fetch
+        for tri in _line_trigrams(token):
+            posting = postings.get(tri)
+            if not posting:
+                return []  # a trigram nobody contains: no row can match
+            posting_sets.append(posting)
+
+    # Intersect smallest-first so the working set shrinks fastest
+    posting_sets.sort(key=len)
+    candidates = set(posting_sets[0])
+    for posting in posting_sets[1:]:
+        candidates &= posting
+        if not candidates:
+            return []
+
+    results = []
+    candidates = sorted(candidates)  # rowid order keeps fetches sequential
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        for start in range(0, len(candidates), 500):
+            batch = candidates[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = cur.execute(
+                f"SELECT line FROM records WHERE rowid IN ({placeholders})",
+                batch
+            ).fetchall()
+            results.extend(_verify_tokens([r[0] for r in rows], tokens))
+            if len(results) >= limit:
+                return results[:limit]
+    finally:
+        conn.close()
+    return results
+
+def _scan_with_automaton(engine, tokens, limit):
+    """
+    Single-pass multi-pattern scan for queries where every token is
+    under 3 characters, so neither the trigram sidecar nor FTS5 can
+    prune and the alternative is one full LIKE scan per token. An
+    Aho-Corasick automaton finds every occurrence of every token in one
+    pass over each 10k-row batch.
+    """
+    unique_tokens = sorted(set(tokens))
+    automaton = ahocorasick.Automaton()
+    for i, token in enumerate(unique_tokens):
+        automaton.add_word(token, i)
+    automaton.make_automaton()
+    all_hit = (1 << len(unique_tokens)) - 1
+
+    results = []
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT line FROM records")
+        while True:
+            rows = cur.fetchmany(10000)
+            if not rows:
+                break
+            lines = [r[0] for r in rows]
+            # Lowercase per line (lower() can change string length for
+            # some characters, so offsets must come from the lowered
+            # strings), then scan one concatenated buffer.
+            lowered = [line.lower() for line in lines]
+            offsets = []
+            pos = 0
+            for low in lowered:
+                offsets.append(pos)
+                pos += len(low) + 1  # +1 for the '\n' separator
+            buf = "\n".join(lowered)
+
+            # Tokens contain no whitespace, so no match spans the separator
+            hits = [0] * len(lines)
+            for end_pos, token_id in automaton.iter(buf):
+                line_idx = bisect.bisect_right(offsets, end_pos) - 1
+                hits[line_idx] |= 1 << token_id
+
+            for i, hit_mask in enumerate(hits):
+                if hit_mask == all_hit:
+                    results.append(lines[i])
+                    if len(results) == limit:
+                        return results
+    finally:
+        conn.close()
+    return results
+
+def _match_then_verify(engine, match_param, short_tokens, limit):
+    """
+    Two-stage search for queries mixing 3+ char and 1-2 char tokens.
+
+    Stage one lets the trigram index produce candidate rows from the
+    selective long tokens alone (MATCH has no false positives, so long
+    tokens need no re-check). Stage two verifies the short tokens over
+    each 10k-row candidate batch with the vectorized Arrow kernel,
+    which beats evaluating per-row LIKE inside SQLite's scan loop.
+    """
+    results = []
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        # LIMIT -1 means unlimited; candidates stream out lazily anyway
+        cur.execute(_search_sql(True, 0), [match_param, -1])
+        while True:
+            rows = cur.fetchmany(10000)
+            if not rows:
+                break
+            results.extend(_verify_tokens([r[0] for r in rows], short_tokens))
+            if len(results) >= limit:
+                return results[:limit]
+    finally:
+        conn.close()
+    return results
 
-def search_records(engine, query_str):
+def _verify_tokens(lines, tokens):
+    """
+    Return the lines containing every token, case-insensitively.
+    Arrow's match_substring kernel runs one vectorized C pass per token
+    over the whole batch, instead of a Python-level check per row.
+    """
+    arr = pa.array(lines, type=pa.large_string())
+    mask = pc.match_substring(arr, tokens[0], ignore_case=True)
+    for token in tokens[1:]:
+        mask = pc.and_(mask, pc.match_substring(arr, token, ignore_case=True))
+    return arr.filter(mask).to_pylist()
+
+def _tokenize(query_str):
+    """Split a user query into lowercased tokens, rarest (longest) first."""
+    tokens = [t.strip().lower() for t in query_str.split() if t.strip()]
+
+    # Evaluate the rarest tokens first: longer substrings are almost
+    # always more selective, so putting them up front lets both the
+    # MATCH intersection and the LIKE chain short-circuit early instead
+    # of grinding through rows that only the common tokens hit.
+    tokens.sort(key=len, reverse=True)
+    return tokens
+
+@lru_cache(maxsize=64)
+def _search_sql(has_match, n_short, count=False):
+    """
+    SQL for a query shape, cached so repeated searches reuse the exact
+    same string: sqlite3 keys its per-connection prepared-statement
+    cache on the SQL text, so identical strings skip re-parsing.
+    """
+    conditions = []
+    if has_match:
+        conditions.append("records MATCH ?")
+    # LIKE is already case-insensitive for ASCII in SQLite, so there's no
+    # need to lower() every row (which would also defeat the trigram
+    # index's LIKE optimization by hiding the column behind a function).
+    conditions.extend(["line LIKE ?"] * n_short)
+    where_clause = " AND ".join(conditions)
+    if count:
+        return f"SELECT count(*) FROM records WHERE {where_clause}"
+    return f"SELECT line FROM records WHERE {where_clause} LIMIT ?"
+
+def _query_params(tokens):
+    """
+    Positional parameters in _search_sql's placeholder order.
+
+    Tokens of 3+ characters go into a single MATCH so SQLite can
+    intersect trigram postings instead of scanning every row.
+    The trigram tokenizer can't index anything shorter, so 1-2 char
+    tokens fall back to a LIKE condition.
+    """
+    match_tokens = [t for t in tokens if len(t) >= 3]
+    short_tokens = [t for t in tokens if len(t) < 3]
+
+    params = []
+    if match_tokens:
+        # quote each token as an FTS5 phrase (doubling embedded quotes)
+        params.append(" ".join(
+            '"{}"'.format(t.replace('"', '""')) for t in match_tokens
+        ))
+    # wrap each short token in %...% for partial substring matching
+    params.extend(f"%{t}%" for t in short_tokens)
+
+    return bool(match_tokens), len(short_tokens), params
+
+def search_records(engine, query_str, limit=200):
     """
     Perform a multi-token, case-insensitive, partial-substring search.
     Example: "cas ford lie" => must find "cas" AND "ford" AND "lie" in the line.
+
+    At most 'limit' rows are returned; the LIMIT is pushed into SQL so
+    SQLite stops as soon as enough matches are found, instead of
+    materializing every hit just for the UI to show the first 200.
+    Callers that want to detect truncation can ask for one row extra.
     """
-    # Split user query into tokens (strip whitespace, lowercase, etc.)
-    tokens = [t.strip().lower() for t in query_str.split() if t.strip()]
+    tokens = _tokenize(query_str)
     if not tokens:
         return []
 
-    # Build a WHERE clause with AND across each token:
-    # e.g.  WHERE lower(line) LIKE :token0 AND lower(line) LIKE :token1 ...
-    conditions = []
-    params = {}
-    for i, token in enumerate(tokens):
-        param_name = f"token{i}"
-        conditions.append(f"lower(line) LIKE :{param_name}")
-        # wrap each token in %...% for partial substring matching
-        params[param_name] = f"%{token}%"
+    # Small tables: intersect the in-process trigram postings instead of
+    # going through SQL at all. Needs at least one 3+ char token to prune.
+    postings = _load_trigram_index(engine)
+    if postings is not None and any(len(t) >= 3 for t in tokens):
+        return _search_with_index(engine, postings, tokens, limit)
 
-    where_clause = " AND ".join(conditions)
-    query = f"SELECT line FROM records WHERE {where_clause}"
+    # All-short-token queries can't use any trigram structure; a single
+    # automaton pass beats one LIKE scan per token.
+    if ahocorasick is not None and all(len(t) < 3 for t in tokens):
+        return _scan_with_automaton(engine, tokens, limit)
 
-    with engine.connect() as conn:
-        result = conn.execute(text(query), params)
-        return [row[0] for row in result]
+    has_match, n_short, params = _query_params(tokens)
+
+    # Mixed long + short tokens: fetch candidates from the trigram index
+    # first, then verify the short tokens vectorized (see
+    # _match_then_verify) instead of chaining LIKE into the same scan.
+    if has_match and n_short:
+        short_tokens = [t for t in tokens if len(t) < 3]
+        return _match_then_verify(engine, params[0], short_tokens, limit)
+
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        rows = cur.execute(_search_sql(has_match, n_short), params + [limit])
+        return [row[0] for row in rows]
+    finally:
+        conn.close()
+
+def count_records(engine, query_str):
+    """
+    Count every row matching the query. Separate from search_records so
+    the full-table count is only paid when the caller explicitly asks.
+    """
+    tokens = _tokenize(query_str)
+    if not tokens:
+        return 0
+
+    has_match, n_short, params = _query_params(tokens)
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        sql = _search_sql(has_match, n_short, count=True)
+        return cur.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()